@@ -3,24 +3,91 @@ Flask Backend for Trailer House Inquiry Form Submission
 Form fields match your screenshot
 CREDENTIALS PATH: /etc/secrets/credentials.json
 """
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
+import sys
 import json
 from datetime import datetime
 import time
+import threading
+import atexit
+import queue
+import logging
+
+# An unknown LOG_LEVEL falls back to WARNING instead of failing at import
+LOG_LEVEL = (os.getenv('LOG_LEVEL') or 'WARNING').upper()
+_log_level_valid = isinstance(logging.getLevelName(LOG_LEVEL), int)
+logging.basicConfig(
+    level=LOG_LEVEL if _log_level_valid else logging.WARNING,
+    format='%(asctime)s %(levelname)s %(message)s'
+)
+logger = logging.getLogger(__name__)
+if not _log_level_valid:
+    logger.warning("⚠️ Unknown LOG_LEVEL %r - using WARNING", LOG_LEVEL)
 
 # Try to import Google Sheets
 try:
     import gspread
     from google.oauth2.service_account import Credentials
+    from google.auth.transport.requests import AuthorizedSession
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
     SHEETS_AVAILABLE = True
 except ImportError:
     SHEETS_AVAILABLE = False
-    print("Note: gspread not installed - Google Sheets disabled")
+    logger.warning("Note: gspread not installed - Google Sheets disabled")
+
+# Faster JSON encoding for responses when available
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    from flask.json.provider import DefaultJSONProvider
+
+    class OrjsonProvider(DefaultJSONProvider):
+        """Serialize jsonify() responses with orjson (sorted keys, like Flask's default)"""
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+
+        # orjson rejects some values the stdlib handles (e.g. ints beyond 64 bits
+        # echoed from a request body), so fall back to Flask's default encoder
+
+        def dumps(self, obj, **kwargs):
+            try:
+                return orjson.dumps(obj, default=self.default, option=self.option).decode('utf-8')
+            except TypeError:
+                return super().dumps(obj, **kwargs)
+
+        def response(self, *args, **kwargs):
+            try:
+                obj = self._prepare_response_obj(args, kwargs)
+                body = orjson.dumps(obj, default=self.default, option=self.option)
+            except TypeError:
+                return super().response(*args, **kwargs)
+            return self._app.response_class(body, mimetype=self.mimetype)
 
 app = Flask(__name__)
-CORS(app)
+if orjson is not None:
+    app.json = OrjsonProvider(app)
+
+# Render terminates TLS in front of the app; take the client IP from X-Forwarded-For
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
+
+# Per-IP limits for the unauthenticated diagnostic endpoints only.
+# With the default memory:// storage the count is kept per gunicorn worker;
+# set RATELIMIT_STORAGE_URI (e.g. redis://...) to share it across workers.
+DIAGNOSTIC_RATE_LIMIT = "10/minute"
+limiter = Limiter(
+    get_remote_address,
+    app=app,
+    default_limits=[],
+    storage_uri=os.getenv('RATELIMIT_STORAGE_URI', 'memory://')
+)
 
 # Environment variables - GET FROM ENV VARS
 GOOGLE_SHEET_KEY = os.getenv("GOOGLE_SHEET_KEY", "")
@@ -29,84 +96,198 @@ GOOGLE_CREDENTIALS_PATH = os.getenv("GOOGLE_CREDENTIALS_PATH", "")
 # CORRECT credentials file path for Render Secret Files
 CREDENTIALS_FILE_PATH = "/etc/secrets/credentials.json"
 
+# Secret Files are mounted before the app starts and never change afterwards
+CREDENTIALS_FILE_EXISTS = os.path.exists(CREDENTIALS_FILE_PATH)
+
 # Your Vercel frontend
 FRONTEND_DOMAIN = "https://nortiq-trailer-house-vercel-9afi.vercel.app"
 
+# Only the form endpoint is called cross-origin; browsers cache the preflight for a day
+CORS(
+    app,
+    resources={r"/submit": {"origins": FRONTEND_DOMAIN}},
+    max_age=86400,
+    methods=['POST', 'OPTIONS'],
+    allow_headers=['Content-Type']
+)
+
+# Separator for the local development startup banner
+BANNER_SEP = "=" * 60
+
+# Form fields that must be filled in for /submit
+REQUIRED_FIELDS = ('name', 'email', 'phone', 'content')
+_MISSING_FIELDS_ERROR = {
+    'success': False,
+    'error': '必須項目が入力されていません'
+}
+
+# Google Sheets handles - created once per process, reused across requests
+_sheets_state = {'client': None, 'worksheet': None, 'headers_checked': False}
+_sheets_lock = threading.Lock()
+
+# Rows waiting for the background worker to write them with append_rows
+SUBMISSION_QUEUE_SIZE = 1000
+FLUSH_INTERVAL = 2  # seconds to collect a batch
+FLUSH_BATCH_SIZE = 20
+RETRY_INTERVAL = 30  # seconds between retries of a failed batch
+submission_queue = queue.Queue(maxsize=SUBMISSION_QUEUE_SIZE)
+_pending_rows = []  # drained from the queue but not yet written
+_flush_lock = threading.Lock()
+
+# Full tracebacks are logged at most once per interval for each
+# (message, exception type); identical repeats get one line
+EXCEPTION_LOG_INTERVAL = 60  # seconds
+_last_logged_exc_times = {}
+
+def log_exception(msg, *args):
+    """Log the current exception, with traceback only if the same error wasn't logged recently"""
+    key = (msg, sys.exc_info()[0])
+    now = time.monotonic()
+    if now - _last_logged_exc_times.get(key, float('-inf')) > EXCEPTION_LOG_INTERVAL:
+        _last_logged_exc_times[key] = now
+        logger.exception(msg, *args)
+    else:
+        logger.error(msg, *args)
+
+def load_credentials():
+    """Load credentials from EXACT path"""
+    logger.info("📂 Loading from: %s", CREDENTIALS_FILE_PATH)
+    
+    if not CREDENTIALS_FILE_EXISTS:
+        logger.warning("❌ File not found: %s", CREDENTIALS_FILE_PATH)
+        logger.warning("💡 Upload to Render → Environment → Secret Files (mount path: /etc/secrets, filename: credentials.json)")
+        return None
+    
+    try:
+        with open(CREDENTIALS_FILE_PATH, 'r') as f:
+            credentials = json.load(f)
+        
+        # Verify required fields
+        required = ['type', 'project_id', 'private_key_id', 'private_key', 'client_email']
+        missing = [field for field in required if field not in credentials]
+        
+        if missing:
+            logger.error("❌ Missing fields: %s", missing)
+            return None
+        
+        logger.info("✅ Loaded credentials for: %s", credentials.get('client_email', 'Unknown'))
+        return credentials
+        
+    except Exception as e:
+        logger.error("❌ Error reading %s: %s", CREDENTIALS_FILE_PATH, e)
+        return None
+
+# Render Secret Files are fixed for the life of the container - parse once at startup
+CREDENTIALS_DICT = load_credentials()
+
+# CORRECTED SCOPE - ADD DRIVE PERMISSION
+SCOPES = (
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive.file",
+    "https://www.googleapis.com/auth/drive"
+)
+
+# Parsing the private key is the costliest step, so build Credentials once.
+# google-auth refreshes the access token internally for the process lifetime.
+CREDS = None
+if SHEETS_AVAILABLE and CREDENTIALS_DICT:
+    try:
+        CREDS = Credentials.from_service_account_info(CREDENTIALS_DICT, scopes=SCOPES)
+    except Exception as e:
+        logger.error("❌ Invalid service account credentials: %s", e)
+
+# Static landing payload - serialized once instead of on every GET /
+_HOME_DATA = {
+    'status': 'ok',
+    'service': 'Trailer House Inquiry Form Backend',
+    'frontend': FRONTEND_DOMAIN,
+    'form_fields': {
+        'consultation_method': 'オンライン（Team / Zoom）, 電話',
+        'consultation_type': 'トレーテールウスについて聞きたい, 新築戸建施設について聞きたい, お見積りについて聞きたい, その他',
+        'name': '名前',
+        'furigana': 'ふりがな',
+        'email': 'メールアドレス',
+        'phone': '電話番号',
+        'content': 'ご相談内容'
+    },
+    'config': {
+        'google_sheets': bool(GOOGLE_SHEET_KEY),
+        'credentials_path': CREDENTIALS_FILE_PATH,
+        'file_exists': CREDENTIALS_FILE_EXISTS if SHEETS_AVAILABLE else 'N/A',
+        'sheets_library': 'AVAILABLE' if SHEETS_AVAILABLE else 'NOT AVAILABLE'
+    },
+    'endpoints': {
+        'submit': '/submit (POST)',
+        'health': '/health (GET)',
+        'test': '/test (GET)',
+        'debug': '/debug (GET)',
+        'check_creds': '/check-creds (GET)'
+    }
+}
+if orjson is not None:
+    _HOME_PAYLOAD = orjson.dumps(_HOME_DATA, option=OrjsonProvider.option)
+else:
+    _HOME_PAYLOAD = json.dumps(_HOME_DATA, ensure_ascii=False, sort_keys=True).encode('utf-8')
+
+# Fields of /test that don't change while the process runs
+_TEST_STATIC = {
+    'google_sheet_key': 'SET' if GOOGLE_SHEET_KEY else 'NOT SET',
+    'credentials_path': CREDENTIALS_FILE_PATH,
+    'file_exists': CREDENTIALS_FILE_EXISTS and SHEETS_AVAILABLE,
+    'file_exists_detail': 'YES' if CREDENTIALS_FILE_EXISTS and SHEETS_AVAILABLE else 'NO - Check Render Secret Files',
+    'sheets_library': 'AVAILABLE' if SHEETS_AVAILABLE else 'NOT AVAILABLE',
+    'frontend': FRONTEND_DOMAIN
+}
+
+# Fields of /debug that don't change while the process runs
+_DEBUG_STATIC = {
+    'credentials_path': CREDENTIALS_FILE_PATH,
+    'file_exists': CREDENTIALS_FILE_EXISTS,
+    'sheets_available': SHEETS_AVAILABLE,
+    'frontend': FRONTEND_DOMAIN,
+    'render_environment': bool(os.getenv('RENDER')),
+    'environment': {
+        'GOOGLE_SHEET_KEY_set': bool(GOOGLE_SHEET_KEY),
+        'GOOGLE_CREDENTIALS_PATH_set': bool(GOOGLE_CREDENTIALS_PATH)
+    }
+}
+
 @app.route('/')
 def home():
-    return jsonify({
-        'status': 'ok',
-        'service': 'Trailer House Inquiry Form Backend',
-        'frontend': FRONTEND_DOMAIN,
-        'form_fields': {
-            'consultation_method': 'オンライン（Team / Zoom）, 電話',
-            'consultation_type': 'トレーテールウスについて聞きたい, 新築戸建施設について聞きたい, お見積りについて聞きたい, その他',
-            'name': '名前',
-            'furigana': 'ふりがな',
-            'email': 'メールアドレス',
-            'phone': '電話番号',
-            'content': 'ご相談内容'
-        },
-        'config': {
-            'google_sheets': bool(GOOGLE_SHEET_KEY),
-            'credentials_path': CREDENTIALS_FILE_PATH,
-            'file_exists': os.path.exists(CREDENTIALS_FILE_PATH) if SHEETS_AVAILABLE else 'N/A',
-            'sheets_library': 'AVAILABLE' if SHEETS_AVAILABLE else 'NOT AVAILABLE'
-        },
-        'endpoints': {
-            'submit': '/submit (POST)',
-            'health': '/health (GET)',
-            'test': '/test (GET)',
-            'debug': '/debug (GET)',
-            'check_creds': '/check-creds (GET)'
-        }
-    })
+    # New Response per request: after_request hooks may mutate its headers
+    return Response(_HOME_PAYLOAD, mimetype='application/json')
 
 @app.route('/health')
 def health():
     return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()})
 
 @app.route('/test')
+@limiter.limit(DIAGNOSTIC_RATE_LIMIT)
 def test():
     """Check configuration"""
-    creds_file_exists = os.path.exists(CREDENTIALS_FILE_PATH) if SHEETS_AVAILABLE else False
-    
     return jsonify({
-        'google_sheet_key': 'SET' if GOOGLE_SHEET_KEY else 'NOT SET',
-        'credentials_path': CREDENTIALS_FILE_PATH,
-        'file_exists': creds_file_exists,
-        'file_exists_detail': 'YES' if creds_file_exists else 'NO - Check Render Secret Files',
-        'sheets_library': 'AVAILABLE' if SHEETS_AVAILABLE else 'NOT AVAILABLE',
-        'frontend': FRONTEND_DOMAIN,
+        **_TEST_STATIC,
         'server_time': datetime.now().isoformat()
     })
 
 @app.route('/debug')
+@limiter.limit(DIAGNOSTIC_RATE_LIMIT)
 def debug():
     """Debug credentials file"""
     debug_info = {
-        'credentials_path': CREDENTIALS_FILE_PATH,
-        'file_exists': os.path.exists(CREDENTIALS_FILE_PATH),
-        'sheets_available': SHEETS_AVAILABLE,
-        'frontend': FRONTEND_DOMAIN,
-        'server_time': time.time(),
-        'render_environment': bool(os.getenv('RENDER')),
-        'environment': {
-            'GOOGLE_SHEET_KEY_set': bool(GOOGLE_SHEET_KEY),
-            'GOOGLE_CREDENTIALS_PATH_set': bool(GOOGLE_CREDENTIALS_PATH)
-        }
+        **_DEBUG_STATIC,
+        'server_time': time.time()
     }
     
-    if os.path.exists(CREDENTIALS_FILE_PATH):
+    if CREDENTIALS_FILE_EXISTS:
         try:
+            debug_info['file_size'] = os.path.getsize(CREDENTIALS_FILE_PATH)
             with open(CREDENTIALS_FILE_PATH, 'r') as f:
-                content = f.read()
-                debug_info['file_size'] = len(content)
                 debug_info['file_readable'] = True
                 
                 # Try to parse as JSON
                 try:
-                    creds = json.loads(content)
+                    creds = json.load(f)
                     debug_info['json_valid'] = True
                     debug_info['service_account'] = creds.get('client_email', 'Not found')
                     debug_info['project_id'] = creds.get('project_id', 'Not found')
@@ -126,12 +307,13 @@ def debug():
     return jsonify(debug_info)
 
 @app.route('/check-creds', methods=['GET'])
+@limiter.limit(DIAGNOSTIC_RATE_LIMIT)
 def check_credentials():
     """Verify credentials file"""
     try:
-        print(f"🔍 Checking credentials at: {CREDENTIALS_FILE_PATH}")
+        logger.info("🔍 Checking credentials at: %s", CREDENTIALS_FILE_PATH)
         
-        if not os.path.exists(CREDENTIALS_FILE_PATH):
+        if not CREDENTIALS_FILE_EXISTS:
             return jsonify({
                 'status': 'error',
                 'message': 'File not found at exact path',
@@ -139,10 +321,10 @@ def check_credentials():
                 'instruction': '1. Go to Render → Your Service → Environment\n2. Scroll to "Secret Files"\n3. Add file with mount path: /etc/secrets\n4. Filename: credentials.json\n5. Paste your service account JSON'
             }), 404
         
+        file_size = os.path.getsize(CREDENTIALS_FILE_PATH)
+        logger.info("📄 File size: %d bytes", file_size)
         with open(CREDENTIALS_FILE_PATH, 'r') as f:
-            content = f.read()
-            print(f"📄 File size: {len(content)} bytes")
-            creds = json.loads(content)
+            creds = json.load(f)
         
         # Extract key details
         client_email = creds.get('client_email', '')
@@ -151,7 +333,7 @@ def check_credentials():
             'status': 'success',
             'message': 'Credentials file is valid',
             'file_path': CREDENTIALS_FILE_PATH,
-            'file_size': len(content),
+            'file_size': file_size,
             'service_account': client_email,
             'share_sheet_with': client_email,  # EMAIL TO SHARE GOOGLE SHEET WITH
             'project_id': creds.get('project_id'),
@@ -160,7 +342,7 @@ def check_credentials():
         })
         
     except json.JSONDecodeError as e:
-        print(f"❌ JSON Parse Error: {e}")
+        logger.error("❌ JSON Parse Error: %s", e)
         return jsonify({
             'status': 'error',
             'message': 'Invalid JSON format',
@@ -168,7 +350,7 @@ def check_credentials():
             'file_path': CREDENTIALS_FILE_PATH
         }), 500
     except Exception as e:
-        print(f"❌ Error: {e}")
+        logger.error("❌ Error: %s", e)
         return jsonify({
             'status': 'error',
             'message': str(e),
@@ -176,198 +358,217 @@ def check_credentials():
             'file_path': CREDENTIALS_FILE_PATH
         }), 500
 
-def load_credentials():
-    """Load credentials from EXACT path"""
-    print(f"📂 Loading from: {CREDENTIALS_FILE_PATH}")
-    
-    if not os.path.exists(CREDENTIALS_FILE_PATH):
-        print(f"❌ File not found: {CREDENTIALS_FILE_PATH}")
-        print("💡 Upload to Render → Environment → Secret Files")
-        print("💡 Mount Path: /etc/secrets")
-        print("💡 Filename: credentials.json")
-        return None
-    
-    try:
-        with open(CREDENTIALS_FILE_PATH, 'r') as f:
-            credentials = json.load(f)
+def get_worksheet():
+    """Return the cached worksheet, authorizing and opening it on first use"""
+    with _sheets_lock:
+        if _sheets_state['worksheet'] is not None:
+            return _sheets_state['worksheet']
+        
+        logger.info("✅ Service Account: %s", CREDS.service_account_email)
+        logger.info("✅ Project: %s", CREDENTIALS_DICT.get('project_id', 'Unknown'))
+        
+        # One pooled keep-alive session for all Sheets API calls; retries
+        # only idempotent requests, so append_rows is never sent twice
+        session = AuthorizedSession(CREDS)
+        session.mount('https://', HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+        ))
+        client = gspread.Client(auth=CREDS, session=session)
         
-        # Verify required fields
-        required = ['type', 'project_id', 'private_key_id', 'private_key', 'client_email']
-        missing = [field for field in required if field not in credentials]
-        
-        if missing:
-            print(f"❌ Missing fields: {missing}")
-            return None
-        
-        print(f"✅ Loaded credentials for: {credentials.get('client_email', 'Unknown')}")
-        return credentials
+        # Open spreadsheet
+        logger.info("🔓 Opening Google Sheet...")
+        spreadsheet = client.open_by_key(GOOGLE_SHEET_KEY)
+        worksheet = spreadsheet.sheet1
+        logger.info("✅ Opened sheet: %s", worksheet.title)
         
-    except Exception as e:
-        print(f"❌ Error reading {CREDENTIALS_FILE_PATH}: {e}")
-        return None
+        _sheets_state['client'] = client
+        _sheets_state['worksheet'] = worksheet
+        return worksheet
 
-def save_to_google_sheets(data):
-    """Save form data to Google Sheets"""
+def save_to_google_sheets(data, now_sheet=None):
+    """Queue form data for the next batched write to Google Sheets"""
     if not SHEETS_AVAILABLE:
-        print("❌ Google Sheets library not available")
+        logger.error("❌ Google Sheets library not available")
         return False
     
     if not GOOGLE_SHEET_KEY:
-        print("❌ GOOGLE_SHEET_KEY not set")
+        logger.error("❌ GOOGLE_SHEET_KEY not set")
         return False
     
+    if CREDS is None:
+        logger.error("❌ FAILED: Could not load credentials")
+        return False
+    
+    # Prepare data row
+    consultation_type = data.get('consultation_type', '')
+    if isinstance(consultation_type, list):
+        consultation_type = ', '.join(consultation_type)
+    
+    row = [
+        now_sheet or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        data.get('consultation_method', ''),
+        consultation_type,
+        data.get('name', ''),
+        data.get('furigana', ''),
+        data.get('email', ''),
+        data.get('phone', ''),
+        data.get('content', '')
+    ]
+    
+    logger.debug("📝 Data: %s", row)
+    
     try:
-        print("="*50)
-        print("📊 GOOGLE SHEETS SAVE ATTEMPT")
-        print("="*50)
-        print(f"📁 Credentials: {CREDENTIALS_FILE_PATH}")
-        print(f"🔑 Sheet ID: {GOOGLE_SHEET_KEY}")
-        print(f"⏰ Time: {datetime.now().isoformat()}")
-        
-        # Load credentials from EXACT path
-        credentials_dict = load_credentials()
-        if not credentials_dict:
-            print("❌ FAILED: Could not load credentials")
-            return False
-        
-        service_email = credentials_dict.get('client_email', 'Unknown')
-        print(f"✅ Service Account: {service_email}")
-        print(f"✅ Project: {credentials_dict.get('project_id', 'Unknown')}")
-        
-        # CORRECTED SCOPE - ADD DRIVE PERMISSION
-        scope = [
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive.file",
-            "https://www.googleapis.com/auth/drive"
-        ]
-        
-        creds = Credentials.from_service_account_info(
-            credentials_dict, 
-            scopes=scope
-        )
+        submission_queue.put_nowait(row)
+    except queue.Full:
+        logger.error("❌ Submission queue full (%d) - row not saved", SUBMISSION_QUEUE_SIZE)
+        return False
+    
+    logger.info("📥 Queued for Google Sheets (%d pending)", submission_queue.qsize())
+    return True
+
+def flush_sheets_buffer():
+    """Write pending rows plus everything still queued in one append_rows call"""
+    with _flush_lock:
+        while True:
+            try:
+                _pending_rows.append(submission_queue.get_nowait())
+            except queue.Empty:
+                break
+        
+        if not _pending_rows:
+            return True
+        
+        if _write_rows(_pending_rows):
+            _pending_rows.clear()
+            return True
+        
+        # Keep failed rows for the next attempt, bounded like the queue
+        overflow = len(_pending_rows) - SUBMISSION_QUEUE_SIZE
+        if overflow > 0:
+            logger.error("❌ Dropping %d oldest unsaved row(s)", overflow)
+            del _pending_rows[:overflow]
+        return False
+
+def _write_rows(rows):
+    """Append rows to Google Sheets, adding headers on first use"""
+    try:
+        logger.info("📊 Google Sheets save: %d row(s) to sheet %s", len(rows), GOOGLE_SHEET_KEY)
         
-        client = gspread.authorize(creds)
+        if CREDS is None:
+            logger.error("❌ FAILED: Could not load credentials")
+            return False
         
-        # Open spreadsheet
-        print(f"🔓 Opening Google Sheet...")
-        spreadsheet = client.open_by_key(GOOGLE_SHEET_KEY)
-        worksheet = spreadsheet.sheet1
-        print(f"✅ Opened sheet: {worksheet.title}")
-        
-        # Check if headers exist, if not add them
-        existing_headers = worksheet.row_values(1)
-        if not existing_headers:
-            print("📝 Adding headers to sheet...")
-            headers = [
-                "Timestamp",
-                "相談方法",
-                "相談種類",
-                "名前",
-                "ふりがな",
-                "メールアドレス",
-                "電話番号",
-                "ご相談内容"
-            ]
-            worksheet.append_row(headers)
-            print("✅ Headers added")
-        
-        # Prepare data row
-        consultation_type = data.get('consultation_type', '')
-        if isinstance(consultation_type, list):
-            consultation_type = ', '.join(consultation_type)
-        
-        row = [
-            datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            data.get('consultation_method', ''),
-            consultation_type,
-            data.get('name', ''),
-            data.get('furigana', ''),
-            data.get('email', ''),
-            data.get('phone', ''),
-            data.get('content', '')
-        ]
-        
-        print(f"📝 Data: {row}")
-        
-        # Append row
-        worksheet.append_row(row)
-        print(f"✅ SUCCESS: Saved to Google Sheets!")
-        print(f"👤 User: {data.get('name', 'Unknown')}")
-        print("="*50)
+        worksheet = get_worksheet()
+        
+        # Check if headers exist, if not add them (once per process)
+        if not _sheets_state['headers_checked']:
+            existing_headers = worksheet.row_values(1)
+            if not existing_headers:
+                logger.info("📝 Adding headers to sheet...")
+                headers = [
+                    "Timestamp",
+                    "相談方法",
+                    "相談種類",
+                    "名前",
+                    "ふりがな",
+                    "メールアドレス",
+                    "電話番号",
+                    "ご相談内容"
+                ]
+                worksheet.append_row(headers)
+                logger.info("✅ Headers added")
+            _sheets_state['headers_checked'] = True
+        
+        # Append all pending rows in one request; RAW stores user input verbatim (no formulas)
+        worksheet.append_rows(rows, value_input_option='RAW', insert_data_option='INSERT_ROWS')
+        logger.info("✅ SUCCESS: Saved %d row(s) to Google Sheets!", len(rows))
         return True
         
     except Exception as e:
-        print(f"❌ GOOGLE SHEETS ERROR: {type(e).__name__}")
-        print(f"❌ Details: {str(e)}")
+        log_exception("❌ GOOGLE SHEETS ERROR: %s: %s", type(e).__name__, e)
         
         # Specific error handling
         if 'invalid_grant' in str(e):
-            print("🔑 ERROR: Invalid JWT Signature")
-            print("💡 Solution: Regenerate credentials or check time sync")
+            logger.error("🔑 Invalid JWT Signature - regenerate credentials or check time sync")
         elif 'PERMISSION_DENIED' in str(e):
-            print("🔑 ERROR: Permission denied")
-            print(f"💡 Solution: Share sheet with: {credentials_dict.get('client_email', 'service account')}")
+            logger.error("🔑 Permission denied - share sheet with: %s", (CREDENTIALS_DICT or {}).get('client_email', 'service account'))
         elif 'not found' in str(e).lower():
-            print("🔑 ERROR: Sheet not found")
-            print("💡 Solution: Check GOOGLE_SHEET_KEY environment variable")
+            logger.error("🔑 Sheet not found - check GOOGLE_SHEET_KEY environment variable")
         elif 'sheet1' in str(e).lower():
-            print("🔑 ERROR: sheet1 not found")
-            print("💡 Solution: Make sure your Google Sheet has at least one worksheet")
+            logger.error("🔑 sheet1 not found - make sure your Google Sheet has at least one worksheet")
         
-        import traceback
-        traceback.print_exc()
         return False
 
-@app.route('/submit', methods=['POST', 'OPTIONS'])
+def _add_pending(row):
+    """Move a row taken off the queue into _pending_rows, where flushes can see it"""
+    with _flush_lock:
+        _pending_rows.append(row)
+
+def _sheets_worker():
+    """Background loop: collect submissions into batches and flush them"""
+    while True:
+        try:
+            # Block until work arrives; wake periodically if a batch failed
+            _add_pending(submission_queue.get(timeout=RETRY_INTERVAL if _pending_rows else None))
+        except queue.Empty:
+            flush_sheets_buffer()
+            continue
+        
+        # Collected rows go straight to _pending_rows (not a local list) so the
+        # atexit flush still writes them if the process stops mid-batch
+        collected = 1
+        deadline = time.monotonic() + FLUSH_INTERVAL
+        while collected < FLUSH_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                _add_pending(submission_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+            collected += 1
+        
+        flush_sheets_buffer()
+
+threading.Thread(target=_sheets_worker, name='sheets-worker', daemon=True).start()
+atexit.register(flush_sheets_buffer)
+
+@app.route('/submit', methods=['POST'])
 def submit_form():
     """Handle form submission - Trailer House Inquiry Form"""
-    if request.method == 'OPTIONS':
-        return jsonify({'status': 'ok'}), 200
-    
-    print("\n" + "="*60)
-    print("📝 FORM SUBMISSION - Trailer House Inquiry")
-    print("="*60)
+    # One timestamp per submission, shared by the sheet row and the response
+    now = datetime.now()
     
     try:
-        # Get data - support both JSON and form data
-        if request.is_json:
-            data = request.json
-        else:
-            data = request.form.to_dict()
+        # Get data - support both JSON and form data (form is read in place, not copied)
+        data = request.get_json(silent=True) or request.form
         
-        print(f"👤 Name: {data.get('name', 'Unknown')}")
-        print(f"📧 Email: {data.get('email', 'No email')}")
-        print(f"📞 Phone: {data.get('phone', 'No phone')}")
+        logger.info("📝 Form submission: name=%s email=%s phone=%s",
+                    data.get('name', 'Unknown'), data.get('email', 'No email'), data.get('phone', 'No phone'))
         
         # Validate required fields
-        required_fields = ['name', 'email', 'phone', 'content']
-        missing_fields = []
-        
-        for field in required_fields:
-            if not data.get(field):
-                missing_fields.append(field)
+        missing_fields = [field for field in REQUIRED_FIELDS if not data.get(field)]
         
         if missing_fields:
-            print(f"❌ Missing fields: {missing_fields}")
-            return jsonify({
-                'success': False,
-                'error': '必須項目が入力されていません',
-                'missing_fields': missing_fields
-            }), 400
+            logger.info("❌ Missing fields: %s", missing_fields)
+            return jsonify({**_MISSING_FIELDS_ERROR, 'missing_fields': missing_fields}), 400
         
-        # Save to Google Sheets
+        # Queue for Google Sheets - written by the background worker
         sheets_success = False
         if GOOGLE_SHEET_KEY and SHEETS_AVAILABLE:
-            sheets_success = save_to_google_sheets(data)
+            now_sheet = now.strftime('%Y-%m-%d %H:%M:%S')
+            sheets_success = 'queued' if save_to_google_sheets(data, now_sheet=now_sheet) else False
         else:
-            print("⚠️ Google Sheets: Not configured")
+            logger.info("⚠️ Google Sheets: Not configured")
         
         # Prepare response
         response = {
             'success': True,
             'message': 'お問い合わせが正常に送信されました。確認後、担当者よりご連絡いたします。',
             'sheets_saved': sheets_success,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': now.isoformat(),
             'form_data': {
                 'name': data.get('name', ''),
                 'email': data.get('email', ''),
@@ -375,32 +576,30 @@ def submit_form():
             }
         }
         
-        print(f"✅ Response: {response}")
-        print("="*60)
+        logger.debug("✅ Response: %s", response)
         
         return jsonify(response), 200
         
     except Exception as e:
-        print(f"❌ Server error: {e}")
-        import traceback
-        traceback.print_exc()
+        log_exception("❌ Server error: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 if __name__ == '__main__':
+    # Local development only - production runs under gunicorn (see gunicorn_config.py)
     port = int(os.getenv('PORT', 10000))
-    print("\n" + "="*60)
+    print("\n" + BANNER_SEP)
     print("🚀 TRAILER HOUSE FORM BACKEND")
-    print("="*60)
+    print(BANNER_SEP)
     print(f"📍 Port: {port}")
     print(f"🌐 Frontend: {FRONTEND_DOMAIN}")
     print(f"📊 Sheets Key: {'✅ SET' if GOOGLE_SHEET_KEY else '❌ NOT SET'}")
     print(f"📁 Credentials Path: {CREDENTIALS_FILE_PATH}")
-    print(f"📁 File Exists: {'✅ YES' if os.path.exists(CREDENTIALS_FILE_PATH) else '❌ NO'}")
+    print(f"📁 File Exists: {'✅ YES' if CREDENTIALS_FILE_EXISTS else '❌ NO'}")
     print(f"📚 Sheets Lib: {'✅ AVAILABLE' if SHEETS_AVAILABLE else '❌ MISSING'}")
-    print("="*60)
+    print(BANNER_SEP)
     print("💡 Upload credentials to Render → Environment → Secret Files")
     print("💡 Mount Path: /etc/secrets")
     print("💡 Filename: credentials.json")
-    print("="*60)
+    print(BANNER_SEP)
     
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
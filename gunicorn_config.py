@@ -9,12 +9,13 @@ import os
 bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
 backlog = 2048
 
-# Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
+# Worker processes - threaded workers so slow requests don't block others
+workers = multiprocessing.cpu_count()
+worker_class = "gthread"
+threads = 8
 worker_connections = 1000
 timeout = 30
-keepalive = 2
+keepalive = 5
 
 # Logging
 accesslog = "-"